@@ -0,0 +1,12 @@
+-- Migration script to add a composite index for paginated session reads
+-- Serves get_session_chats (filter by session_id, newest first) without
+-- a sort step
+
+CREATE INDEX IF NOT EXISTS idx_recipe_chats_session_created
+ON recipe_chats(session_id, created_at DESC);
+
+-- Verify the index was created
+SELECT indexname
+FROM pg_indexes
+WHERE tablename = 'recipe_chats'
+AND indexname = 'idx_recipe_chats_session_created';
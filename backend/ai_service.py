@@ -1,26 +1,75 @@
 import os
-import json
-from typing import List, Dict, Any, Optional
-from models import Recipe, NutritionInfo
-import re
-from huggingface_hub import InferenceClient
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from functools import lru_cache
+from models import Recipe, RecipeIn, NutritionInfo
+import orjson
+from huggingface_hub import AsyncInferenceClient
+
+logger = logging.getLogger('axium.ai')
+
+# Maximum number of ingredient queries kept in the recipe cache
+RECIPE_CACHE_SIZE = 1024
+
+# Micro-batching window and batch size for concurrent HF calls
+BATCH_WINDOW_MS = int(os.getenv('AI_BATCH_WINDOW_MS', '20'))
+MAX_BATCH = 16
+
+# Timeout (seconds) for HF inference requests
+HF_REQUEST_TIMEOUT = float(os.getenv('HUGGINGFACE_TIMEOUT', '30'))
+
+class _Batcher:
+    """Collates concurrent prompts and fires them as one gathered batch
+
+    The HF Inference API does not accept a list of prompts, so the batch
+    is issued as parallel requests via asyncio.gather — overlapping N
+    round-trips into roughly one round-trip's worth of wall time.
+    """
+
+    def __init__(self, complete: Callable[[str], Awaitable[str]]):
+        self._complete = complete
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    async def submit(self, prompt: str) -> str:
+        """Queue a prompt and wait for its completion text"""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._drain_loop())
+
+        future: asyncio.Future = loop.create_future()
+        self._queue.put_nowait((prompt, future))
+        return await future
+
+    async def _drain_loop(self):
+        while True:
+            batch: List[Tuple[str, asyncio.Future]] = [await self._queue.get()]
+
+            # Give other requests a short window to join the batch
+            await asyncio.sleep(BATCH_WINDOW_MS / 1000)
+            while len(batch) < MAX_BATCH and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            results = await asyncio.gather(
+                *(self._complete(prompt) for prompt, _ in batch),
+                return_exceptions=True
+            )
+
+            for (_, future), result in zip(batch, results):
+                if future.cancelled():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
 
 class AIService:
     """Handles AI recipe generation using HuggingFace Inference API"""
-    
-    def __init__(self):
-        self.api_token = os.getenv('HUGGINGFACE_API_TOKEN')
-        self.model_name = os.getenv('HUGGINGFACE_MODEL_NAME', 'mistralai/Mistral-7B-Instruct-v0.3')
-        
-        if not self.api_token:
-            raise ValueError("HuggingFace API token must be set in environment variables")
-        
-        # Initialize the InferenceClient with the token
-        self.client = InferenceClient(token=self.api_token)
-    
-    def _create_recipe_prompt(self, ingredients: str) -> str:
-        """Create a structured prompt for recipe generation"""
-        prompt = f"""You are a professional chef and recipe creator. Given the following ingredients: {ingredients}
+
+    # Built once at import time; only the ingredients slot varies per call
+    _PROMPT_TEMPLATE = """You are a professional chef and recipe creator. Given the following ingredients: {ingredients}
 
 Create 2-3 delicious recipes using these ingredients. For each recipe, provide:
 
@@ -48,25 +97,114 @@ Format your response as a JSON array with this structure:
 ]
 
 Provide only the JSON response, no additional text."""
-        return prompt
+
+    def __init__(self):
+        self.api_token = os.getenv('HUGGINGFACE_API_TOKEN')
+        self.model_name = os.getenv('HUGGINGFACE_MODEL_NAME', 'mistralai/Mistral-7B-Instruct-v0.3')
+        
+        if not self.api_token:
+            raise ValueError("HuggingFace API token must be set in environment variables")
+        
+        # Async client so HF round-trips don't block the event loop.
+        # It keeps one session per event loop, so all requests share a
+        # keep-alive connection pool as long as this instance lives.
+        self.async_client = AsyncInferenceClient(token=self.api_token, timeout=HF_REQUEST_TIMEOUT)
+
+        # LRU cache of generated recipes keyed by normalized ingredients
+        self._recipe_cache: OrderedDict[str, List[Recipe]] = OrderedDict()
+
+        # Micro-batcher that overlaps concurrent HF calls
+        self._batcher = _Batcher(self._complete_prompt)
+
+        # In-flight generations by cache key, for single-flight coalescing
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def _complete_prompt(self, prompt: str) -> str:
+        """Run a single chat completion and return the generated text"""
+        messages = [{"role": "user", "content": prompt}]
+        response = await self.async_client.chat_completion(
+            messages=messages,
+            model=self.model_name,
+            max_tokens=1000,
+            temperature=0.7
+        )
+        return response.choices[0].message.content
+
+    @staticmethod
+    def _normalize_ingredients(ingredients: str) -> str:
+        """Normalize an ingredient string into a canonical cache key"""
+        parts = sorted(part.strip().lower() for part in ingredients.split(','))
+        return ','.join(part for part in parts if part)
+
+    def _cache_get(self, cache_key: str) -> Optional[List[Recipe]]:
+        """Look up cached recipes, refreshing LRU order on a hit"""
+        cached = self._recipe_cache.get(cache_key)
+        if cached is None:
+            return None
+        self._recipe_cache.move_to_end(cache_key)
+        return [recipe.model_copy(deep=True) for recipe in cached]
+
+    def _cache_put(self, cache_key: str, recipes: List[Recipe]) -> None:
+        """Store recipes in the cache, evicting the oldest entry when full"""
+        self._recipe_cache[cache_key] = [recipe.model_copy(deep=True) for recipe in recipes]
+        self._recipe_cache.move_to_end(cache_key)
+        while len(self._recipe_cache) > RECIPE_CACHE_SIZE:
+            self._recipe_cache.popitem(last=False)
     
+    def _create_recipe_prompt(self, ingredients: str) -> str:
+        """Create a structured prompt for recipe generation"""
+        return self._PROMPT_TEMPLATE.format(ingredients=ingredients)
+    
+    @staticmethod
+    def _extract_json_array(response_text: str) -> Optional[str]:
+        """Find the first balanced JSON array in the text with a single scan"""
+        start = response_text.find('[')
+        if start == -1:
+            return None
+
+        depth = 0
+        in_string = False
+        escape = False
+        for i in range(start, len(response_text)):
+            char = response_text[i]
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = not in_string
+            elif not in_string:
+                if char == '[':
+                    depth += 1
+                elif char == ']':
+                    depth -= 1
+                    if depth == 0:
+                        return response_text[start:i + 1]
+
+        return None
+
     def _parse_ai_response(self, response_text: str) -> List[Dict[str, Any]]:
         """Parse AI response and extract recipe JSON"""
+        stripped = response_text.strip()
+
+        # Fast path: the model returned clean JSON with no surrounding prose
+        if stripped.startswith('['):
+            try:
+                return orjson.loads(stripped)
+            except orjson.JSONDecodeError:
+                pass
+
         try:
-            # Try to find JSON in the response
-            json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-                recipes_data = json.loads(json_str)
-                return recipes_data
-            
-            # If no JSON found, try to parse the entire response
-            recipes_data = json.loads(response_text)
-            return recipes_data
-            
-        except json.JSONDecodeError:
-            # Fallback: create a simple recipe from the text
-            return self._create_fallback_recipe(response_text)
+            # Scan for an embedded JSON array in the response
+            json_str = self._extract_json_array(response_text)
+            if json_str:
+                return orjson.loads(json_str)
+
+        except orjson.JSONDecodeError:
+            pass
+
+        # Fallback: create a simple recipe from the text
+        return self._create_fallback_recipe(response_text)
     
     def _create_fallback_recipe(self, response_text: str) -> List[Dict[str, Any]]:
         """Create a fallback recipe when JSON parsing fails"""
@@ -83,52 +221,46 @@ Provide only the JSON response, no additional text."""
             }
         }]
     
-    def _validate_and_fix_recipe(self, recipe_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Validate and fix recipe data structure"""
-        # Ensure required fields exist
-        recipe_data.setdefault('name', 'Unnamed Recipe')
-        recipe_data.setdefault('ingredients', ['No ingredients specified'])
-        recipe_data.setdefault('instructions', ['No instructions provided'])
-        recipe_data.setdefault('cookingTime', '30 minutes')
-        recipe_data.setdefault('difficulty', 'Medium')
-        
-        # Ensure nutrition info exists
-        if 'nutrition' not in recipe_data or not isinstance(recipe_data['nutrition'], dict):
-            recipe_data['nutrition'] = {
-                'calories': 300,
-                'protein': '12g',
-                'carbs': '35g'
-            }
-        
-        # Ensure lists are actually lists
-        if not isinstance(recipe_data['ingredients'], list):
-            recipe_data['ingredients'] = [str(recipe_data['ingredients'])]
-        
-        if not isinstance(recipe_data['instructions'], list):
-            recipe_data['instructions'] = [str(recipe_data['instructions'])]
-        
-        return recipe_data
-    
     async def generate_recipes(self, ingredients: str) -> List[Recipe]:
-        """Generate recipes using AI based on provided ingredients"""
+        """Generate recipes using AI based on provided ingredients
+
+        Concurrent calls for the same (normalized) ingredients coalesce
+        into a single upstream generation: the first caller starts the
+        work, everyone else awaits the same task. A burst of identical
+        requests costs one LLM call instead of N.
+        """
+        cache_key = self._normalize_ingredients(ingredients)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        task = self._inflight.get(cache_key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(
+                self._generate_uncached(ingredients, cache_key)
+            )
+            self._inflight[cache_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+            return await task
+
+        # Follower: share the leader's result, but hand out copies so
+        # callers can't mutate each other's recipes
+        recipes = await task
+        return [recipe.model_copy(deep=True) for recipe in recipes]
+
+    async def _generate_uncached(self, ingredients: str, cache_key: str) -> List[Recipe]:
+        """Run one AI generation and populate the cache"""
         try:
             prompt = self._create_recipe_prompt(ingredients)
             
             # Use conversational mode for Mistral model
             try:
-                # Try with the Mistral model in conversational mode
-                messages = [{"role": "user", "content": prompt}]
-                response = self.client.chat_completion(
-                    messages=messages,
-                    model=self.model_name,
-                    max_tokens=1000,
-                    temperature=0.7
-                )
-                generated_text = response.choices[0].message.content
+                # Submit through the micro-batcher so concurrent calls overlap
+                generated_text = await self._batcher.submit(prompt)
             except Exception as e:
-                print(f"Primary model failed, trying fallback: {e}")
-                # Fallback to a simpler approach
-                generated_text = f"Here's a simple recipe using {ingredients}: Mix all ingredients together and cook for 20 minutes."
+                logger.warning("Primary model failed, using default recipes: %s", e)
+                # No model output to parse — skip the JSON parser entirely
+                return self._create_default_recipes(ingredients)
             
             # Parse the AI response
             recipes_data = self._parse_ai_response(generated_text)
@@ -137,33 +269,25 @@ Provide only the JSON response, no additional text."""
             recipes = []
             for recipe_data in recipes_data:
                 try:
-                    # Validate and fix recipe data
-                    fixed_recipe = self._validate_and_fix_recipe(recipe_data)
-                    
-                    # Create Recipe object
-                    nutrition = NutritionInfo(**fixed_recipe['nutrition'])
-                    recipe = Recipe(
-                        name=fixed_recipe['name'],
-                        ingredients=fixed_recipe['ingredients'],
-                        instructions=fixed_recipe['instructions'],
-                        cookingTime=fixed_recipe['cookingTime'],
-                        difficulty=fixed_recipe['difficulty'],
-                        nutrition=nutrition
-                    )
-                    recipes.append(recipe)
-                    
+                    # One Rust-side pass applies defaults and coercions
+                    recipe_in = RecipeIn.model_validate(recipe_data)
+                    recipes.append(Recipe(**recipe_in.model_dump()))
+
                 except Exception as e:
-                    print(f"Error creating recipe object: {e}")
+                    logger.warning("Error creating recipe object: %s", e)
                     continue
             
             # Ensure we have at least one recipe
             if not recipes:
                 recipes = self._create_default_recipes(ingredients)
-            
+            else:
+                # Only cache real AI results, not fallback recipes
+                self._cache_put(cache_key, recipes)
+
             return recipes
                 
         except Exception as e:
-            print(f"Error generating recipes: {e}")
+            logger.error("Error generating recipes: %s", e)
             return self._create_default_recipes(ingredients)
     
     def _create_default_recipes(self, ingredients: str) -> List[Recipe]:
@@ -199,25 +323,34 @@ Provide only the JSON response, no additional text."""
         try:
             # Simple test request using conversational mode
             messages = [{"role": "user", "content": "Test"}]
-            test_response = self.client.chat_completion(
+            test_response = await self.async_client.chat_completion(
                 messages=messages,
                 model=self.model_name,
                 max_tokens=10,
                 temperature=0.5
             )
             
-            return test_response is not None and test_response.choices
+            # bool() matters: choices is a list, and the is-True checks
+            # at the call sites would read a bare list as unhealthy
+            return bool(test_response is not None and test_response.choices)
             
         except Exception as e:
-            print(f"AI service health check failed: {e}")
+            logger.error("AI service health check failed: %s", e)
             return False
 
-# Global AI service instance
-ai_service = None
+    async def close(self) -> None:
+        """Close the async client's pooled HTTP sessions"""
+        try:
+            await self.async_client.close()
+        except Exception as e:
+            logger.error("Error closing AI service client: %s", e)
 
+# Global AI service instance
+@lru_cache(maxsize=None)
 def get_ai_service() -> AIService:
-    """Get or create AI service instance"""
-    global ai_service
-    if ai_service is None:
-        ai_service = AIService()
-    return ai_service
\ No newline at end of file
+    """Get or create the shared AI service instance
+
+    lru_cache makes repeat calls a C-level dict hit, keeping the accessor
+    effectively free on the request path.
+    """
+    return AIService()
\ No newline at end of file
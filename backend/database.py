@@ -1,52 +1,173 @@
 import os
+import asyncio
+import logging
 from typing import List, Optional, Dict, Any
-from models import RecipeChatRecord
-import json
-from datetime import datetime
-import uuid
-from supabase import create_client, Client
+from collections import defaultdict
+from functools import lru_cache
+from models import Recipe, RecipeChatRecord
+import orjson
+from datetime import datetime, timezone
+from uuid_extensions import uuid7
+from cachetools import TTLCache
+from ciso8601 import parse_datetime
+# supabase 2.6.0 exports the async client as AClient
+from supabase import acreate_client, AClient as AsyncClient
+
+logger = logging.getLogger('axium.database')
+
+# TTL (seconds) for the in-process cache over hot Supabase reads
+READ_CACHE_TTL = int(os.getenv('DB_READ_CACHE_TTL', '15'))
+
+# Flush window and batch size for coalesced Supabase inserts
+WRITE_FLUSH_MS = int(os.getenv('DB_WRITE_FLUSH_MS', '25'))
+MAX_WRITE_BATCH = 32
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse a Supabase ISO-8601 timestamp (accepts trailing 'Z' directly)"""
+    return parse_datetime(value) if value else None
+
+def _json_default(obj: Any) -> Any:
+    """orjson fallback for pydantic models and other rich types"""
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump(mode='json')
+    return str(obj)
+
+def _jsonable_recipes(recipes: List[Any]) -> Dict[str, Any]:
+    """Normalize the recipes payload to plain JSON types via orjson
+
+    Handles dicts and pydantic models alike, so the Supabase client's own
+    encoder only ever sees basic types.
+    """
+    payload = orjson.dumps({'recipes': recipes}, default=_json_default)
+    return orjson.loads(payload)
 
 class DatabaseManager:
     """Manages database operations with Supabase"""
     
     def __init__(self):
-        # Initialize Supabase client
-        supabase_url = os.getenv('SUPABASE_URL')
-        supabase_key = os.getenv('SUPABASE_ANON_KEY')
-        
-        if not supabase_url or not supabase_key:
-            print("⚠️  Warning: Supabase credentials not found, falling back to in-memory storage")
+        # Short-TTL cache absorbing bursts on read-heavy endpoints
+        self._read_cache: TTLCache = TTLCache(maxsize=1024, ttl=READ_CACHE_TTL)
+
+        # Opt-in write coalescing: inserts queue up and flush as one call
+        self._batch_writes = os.getenv('DB_BATCH_WRITES', 'false').lower() == 'true'
+        self._write_queue: Optional[asyncio.Queue] = asyncio.Queue() if self._batch_writes else None
+        self._writer: Optional[asyncio.Task] = None
+
+        # Supabase credentials; the async client is created in connect()
+        self._supabase_url = os.getenv('SUPABASE_URL')
+        self._supabase_key = os.getenv('SUPABASE_ANON_KEY')
+        self.client: Optional[AsyncClient] = None
+
+        # Always available as a safety net until connect() succeeds
+        self._init_memory_storage()
+
+        if not self._supabase_url or not self._supabase_key:
+            logger.warning("Supabase credentials not found, falling back to in-memory storage")
+
+    async def connect(self) -> None:
+        """Create the shared async Supabase client (call once at startup)
+
+        The client keeps one pooled httpx.AsyncClient for its lifetime,
+        so requests reuse keep-alive connections and never block the
+        event loop on database I/O.
+        """
+        if self.client is not None or not self._supabase_url or not self._supabase_key:
+            return
+
+        try:
+            self.client = await acreate_client(self._supabase_url, self._supabase_key)
+            logger.info("Connected to Supabase database")
+        except Exception as e:
+            logger.error("Failed to connect to Supabase: %s", e)
+            logger.warning("Falling back to in-memory storage")
             self.client = None
-            self.chats: Dict[str, RecipeChatRecord] = {}
-        else:
-            try:
-                self.client: Client = create_client(supabase_url, supabase_key)
-                print("📊 Connected to Supabase database")
-            except Exception as e:
-                print(f"❌ Failed to connect to Supabase: {e}")
-                print("📊 Falling back to in-memory storage")
-                self.client = None
-                self.chats: Dict[str, RecipeChatRecord] = {}
+
+    def _init_memory_storage(self):
+        """Set up the in-memory fallback store and its session index"""
+        self.chats: Dict[str, RecipeChatRecord] = {}
+        # session_id -> chat_ids in insertion (chronological) order
+        self._by_session: Dict[str, List[str]] = defaultdict(list)
+        # session_id -> display metadata, maintained on write
+        self._session_meta: Dict[str, Dict[str, Any]] = {}
+
+    def _enqueue_write(self, row: Dict[str, Any]) -> None:
+        """Queue an insert row, lazily starting the flush worker"""
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._drain_writes())
+        self._write_queue.put_nowait(row)
+
+    async def _flush_rows(self, rows: List[Dict[str, Any]]) -> None:
+        """Insert a batch of rows in a single Supabase call"""
+        try:
+            await self.client.table('recipe_chats').insert(rows).execute()
+            self._invalidate_reads('recent', 'sessions')
+        except Exception as e:
+            logger.error("Error flushing batched writes: %s", e)
+
+    async def _drain_writes(self):
+        while True:
+            rows = [await self._write_queue.get()]
+
+            # Short window lets burst inserts coalesce into one call
+            await asyncio.sleep(WRITE_FLUSH_MS / 1000)
+            while len(rows) < MAX_WRITE_BATCH and not self._write_queue.empty():
+                rows.append(self._write_queue.get_nowait())
+
+            await self._flush_rows(rows)
+
+    async def flush(self) -> None:
+        """Flush any queued writes immediately; call before shutdown"""
+        if self._write_queue is None or self._write_queue.empty():
+            return
+
+        rows = []
+        while not self._write_queue.empty():
+            rows.append(self._write_queue.get_nowait())
+        await self._flush_rows(rows)
+
+    def _invalidate_reads(self, *prefixes: str) -> None:
+        """Drop cached reads whose key starts with any of the given prefixes"""
+        stale = [key for key in self._read_cache if key[0] in prefixes]
+        for key in stale:
+            self._read_cache.pop(key, None)
     
-    async def save_recipe_chat(self, session_id: str, ingredients: str, recipes: List[Dict[str, Any]], title: str = "Recipe Analysis") -> Optional[str]:
-        """Save a recipe chat to the database"""
+    async def save_recipe_chat(self, session_id: str, ingredients: str, recipes: List[Recipe], title: str = "Recipe Analysis") -> Optional[str]:
+        """Save a recipe chat to the database
+
+        Accepts Recipe models (or plain dicts) directly; serialization to
+        JSON types happens once, in _jsonable_recipes. All recipes for a
+        chat land in one JSONB payload on a single row, so a save is one
+        round-trip regardless of recipe count (or a fraction of one when
+        DB_BATCH_WRITES coalesces rows).
+        """
         try:
-            chat_id = str(uuid.uuid4())
-            
+            # Time-ordered UUIDv7 keeps btree inserts append-friendly
+            chat_id = uuid7().hex
+            recipes_json = _jsonable_recipes(recipes)
+
             if self.client:
-                # Use Supabase
-                result = self.client.table('recipe_chats').insert({
+                row = {
                     'id': chat_id,
                     'session_id': session_id,
                     'title': title,
                     'ingredients': ingredients,
-                    'recipes_json': {'recipes': recipes}
-                }).execute()
-                
+                    'recipes_json': recipes_json
+                }
+
+                if self._batch_writes:
+                    # Coalesced insert; the id is generated up-front so the
+                    # caller doesn't wait on the flush
+                    self._enqueue_write(row)
+                    return chat_id
+
+                # Use Supabase
+                result = await self.client.table('recipe_chats').insert(row).execute()
+
                 if result.data:
+                    self._invalidate_reads('recent', 'sessions')
                     return chat_id
                 else:
-                    print(f"Failed to save to Supabase: {result}")
+                    logger.error("Failed to save to Supabase: %s", result)
                     return None
             else:
                 # Fallback to in-memory storage
@@ -55,24 +176,31 @@ class DatabaseManager:
                     session_id=session_id,
                     title=title,
                     ingredients=ingredients,
-                    recipes_json={'recipes': recipes},
-                    created_at=datetime.now(),
-                    updated_at=datetime.now()
+                    recipes_json=recipes_json,
+                    created_at=datetime.now(timezone.utc),
+                    updated_at=datetime.now(timezone.utc)
                 )
                 
                 self.chats[chat_id] = chat_record
+                self._by_session[session_id].append(chat_id)
+                if session_id not in self._session_meta:
+                    self._session_meta[session_id] = {
+                        'id': session_id,
+                        'name': title,
+                        'createdAt': chat_record.created_at.isoformat()
+                    }
                 return chat_id
             
         except Exception as e:
-            print(f"Error saving recipe chat: {e}")
+            logger.error("Error saving recipe chat: %s", e)
             return None
     
-    async def get_session_chats(self, session_id: str) -> List[RecipeChatRecord]:
-        """Get all chats for a specific session"""
+    async def get_session_chats(self, session_id: str, limit: int = 100, offset: int = 0) -> List[RecipeChatRecord]:
+        """Get chats for a specific session, newest first, paginated"""
         try:
             if self.client:
-                # Use Supabase
-                result = self.client.table('recipe_chats').select('*').eq('session_id', session_id).order('created_at', desc=True).execute()
+                # Use Supabase; served by the (session_id, created_at DESC) index
+                result = await self.client.table('recipe_chats').select('*').eq('session_id', session_id).order('created_at', desc=True).range(offset, offset + limit - 1).execute()
                 
                 chats = []
                 for row in result.data:
@@ -82,112 +210,111 @@ class DatabaseManager:
                         title=row.get('title', 'Recipe Analysis'),
                         ingredients=row['ingredients'],
                         recipes_json=row['recipes_json'],
-                        created_at=datetime.fromisoformat(row['created_at'].replace('Z', '+00:00')),
-                        updated_at=datetime.fromisoformat(row['updated_at'].replace('Z', '+00:00')) if row['updated_at'] else None
+                        created_at=_parse_timestamp(row['created_at']),
+                        updated_at=_parse_timestamp(row['updated_at'])
                     )
                     chats.append(chat)
                 
                 return chats
             else:
-                # Fallback to in-memory storage
-                chats = [chat for chat in self.chats.values() if chat.session_id == session_id]
-                # Sort by created_at descending
-                chats.sort(key=lambda x: x.created_at, reverse=True)
-                return chats
+                # Fallback to in-memory storage. Inserts are chronological,
+                # so walking the session index in reverse is already sorted.
+                chat_ids = self._by_session.get(session_id, [])
+                chats = [self.chats[chat_id] for chat_id in reversed(chat_ids)]
+                return chats[offset:offset + limit]
             
         except Exception as e:
-            print(f"Error getting session chats: {e}")
+            logger.error("Error getting session chats: %s", e)
             return []
     
     async def get_recent_chats(self, limit: int = 50) -> List[RecipeChatRecord]:
         """Get recent chats across all sessions"""
+        cache_key = ('recent', limit)
+        cached = self._read_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            result = self.client.table('recipe_chats').select('*').order('created_at', desc=True).limit(limit).execute()
-            
-            chats = []
-            for row in result.data:
-                chat = RecipeChatRecord(
+            result = await self.client.table('recipe_chats').select('*').order('created_at', desc=True).limit(limit).execute()
+
+            # Rows from Postgres are already trusted — skip re-validation
+            chats = [
+                RecipeChatRecord.model_construct(
                     id=row['id'],
                     session_id=row['session_id'],
                     title=row.get('title', 'Recipe Analysis'),
                     ingredients=row['ingredients'],
                     recipes_json=row['recipes_json'],
-                    created_at=datetime.fromisoformat(row['created_at'].replace('Z', '+00:00')),
-                    updated_at=datetime.fromisoformat(row['updated_at'].replace('Z', '+00:00')) if row['updated_at'] else None
+                    created_at=_parse_timestamp(row['created_at']),
+                    updated_at=_parse_timestamp(row['updated_at'])
                 )
-                chats.append(chat)
-            
+                for row in result.data
+            ]
+
+            self._read_cache[cache_key] = chats
             return chats
-            
+
         except Exception as e:
-            print(f"Error getting recent chats: {e}")
+            logger.error("Error getting recent chats: %s", e)
             return []
     
-    async def get_all_sessions(self) -> List[Dict[str, Any]]:
-        """Get all unique sessions with their latest chat info"""
+    async def get_all_sessions(self, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        """Get unique sessions with their latest chat info, paginated"""
+        cache_key = ('sessions', limit, offset)
+        cached = self._read_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
             if self.client:
-                # Get distinct session_ids with their latest chat info
-                result = self.client.table('recipe_chats').select('session_id, title, created_at').order('created_at', desc=True).execute()
-                
-                # Group by session_id and get the latest for each
-                sessions_dict = {}
-                for row in result.data:
-                    session_id = row['session_id']
-                    created_at = datetime.fromisoformat(row['created_at'].replace('Z', '+00:00'))
-                    title = row.get('title', 'Recipe Analysis')
-                    
-                    if session_id not in sessions_dict or created_at > sessions_dict[session_id]['created_at']:
-                        sessions_dict[session_id] = {
-                            'id': session_id,
-                            'name': title,
-                            'created_at': created_at
-                        }
-                
-                # Convert to list and sort by creation date
-                sessions = list(sessions_dict.values())
-                sessions.sort(key=lambda x: x['created_at'], reverse=True)
-                
-                # Convert datetime to ISO string for JSON serialization
-                for session in sessions:
-                    session['createdAt'] = session['created_at'].isoformat()
-                    del session['created_at']
-                
-                return sessions
-            else:
-                # Fallback to in-memory storage
-                session_ids = set(chat.session_id for chat in self.chats.values())
+                # Latest chat per session, aggregated in Postgres
+                # (see create_latest_session_chats_view.sql)
+                result = await self.client.table('latest_session_chats').select('*').order('created_at', desc=True).range(offset, offset + limit - 1).execute()
+
                 sessions = []
-                for i, session_id in enumerate(session_ids):
+                for row in result.data:
                     sessions.append({
-                        'id': session_id,
-                        'name': f'Recipe Analysis {i + 1}',
-                        'createdAt': datetime.now().isoformat()
+                        'id': row['session_id'],
+                        'name': row.get('title', 'Recipe Analysis'),
+                        'createdAt': _parse_timestamp(row['created_at']).isoformat()
                     })
+
+                self._read_cache[cache_key] = sessions
                 return sessions
+            else:
+                # Fallback to in-memory storage — metadata is kept on write,
+                # so this is O(sessions) with real timestamps
+                sessions = sorted(
+                    self._session_meta.values(),
+                    key=lambda meta: meta['createdAt'],
+                    reverse=True
+                )
+                return sessions[offset:offset + limit]
                 
         except Exception as e:
-            print(f"Error getting all sessions: {e}")
+            logger.error("Error getting all sessions: %s", e)
             return []
     
     async def delete_chat(self, chat_id: str) -> bool:
         """Delete a specific chat"""
         try:
-            result = self.client.table('recipe_chats').delete().eq('id', chat_id).execute()
+            result = await self.client.table('recipe_chats').delete().eq('id', chat_id).execute()
+            self._invalidate_reads('recent', 'sessions', 'by_id')
             return len(result.data) > 0
             
         except Exception as e:
-            print(f"Error deleting chat: {e}")
+            logger.error("Error deleting chat: %s", e)
             return False
     
     async def delete_session_chats(self, session_id: str) -> bool:
         """Delete all chats for a specific session"""
         try:
-            result = self.client.table('recipe_chats').delete().eq('session_id', session_id).execute()
+            result = await self.client.table('recipe_chats').delete().eq('session_id', session_id).execute()
+            self._invalidate_reads('recent', 'sessions', 'by_id')
             return True
             
         except Exception as e:
-            print(f"Error deleting session chats: {e}")
+            logger.error("Error deleting session chats: %s", e)
             return False
     
     async def update_chat(self, chat_id: str, ingredients: str = None, recipes: List[Dict[str, Any]] = None) -> bool:
@@ -199,58 +326,67 @@ class DatabaseManager:
                 update_data['ingredients'] = ingredients
             
             if recipes is not None:
-                update_data['recipes_json'] = {'recipes': recipes}
+                update_data['recipes_json'] = _jsonable_recipes(recipes)
             
             if not update_data:
                 return False
             
-            result = self.client.table('recipe_chats').update(update_data).eq('id', chat_id).execute()
+            result = await self.client.table('recipe_chats').update(update_data).eq('id', chat_id).execute()
+            self._invalidate_reads('recent', 'by_id')
             return len(result.data) > 0
             
         except Exception as e:
-            print(f"Error updating chat: {e}")
+            logger.error("Error updating chat: %s", e)
             return False
     
     async def update_session_title(self, session_id: str, title: str) -> bool:
         """Update the title for all chats in a session"""
         try:
             if self.client:
-                result = self.client.table('recipe_chats').update({'title': title}).eq('session_id', session_id).execute()
+                result = await self.client.table('recipe_chats').update({'title': title}).eq('session_id', session_id).execute()
+                self._invalidate_reads('recent', 'sessions', 'by_id')
                 return len(result.data) > 0
             else:
                 # Fallback to in-memory storage
-                updated = False
-                for chat in self.chats.values():
-                    if chat.session_id == session_id:
-                        chat.title = title
-                        updated = True
-                return updated
+                chat_ids = self._by_session.get(session_id, [])
+                for chat_id in chat_ids:
+                    self.chats[chat_id].title = title
+                if session_id in self._session_meta:
+                    self._session_meta[session_id]['name'] = title
+                return bool(chat_ids)
             
         except Exception as e:
-            print(f"Error updating session title: {e}")
+            logger.error("Error updating session title: %s", e)
             return False
     
     async def get_chat_by_id(self, chat_id: str) -> Optional[RecipeChatRecord]:
         """Get a specific chat by ID"""
+        cache_key = ('by_id', chat_id)
+        cached = self._read_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            result = self.client.table('recipe_chats').select('*').eq('id', chat_id).execute()
-            
+            result = await self.client.table('recipe_chats').select('*').eq('id', chat_id).execute()
+
             if result.data:
                 row = result.data[0]
-                return RecipeChatRecord(
+                chat = RecipeChatRecord(
                     id=row['id'],
                     session_id=row['session_id'],
                     title=row.get('title', 'Recipe Analysis'),
                     ingredients=row['ingredients'],
                     recipes_json=row['recipes_json'],
-                    created_at=datetime.fromisoformat(row['created_at'].replace('Z', '+00:00')),
-                    updated_at=datetime.fromisoformat(row['updated_at'].replace('Z', '+00:00')) if row['updated_at'] else None
+                    created_at=_parse_timestamp(row['created_at']),
+                    updated_at=_parse_timestamp(row['updated_at'])
                 )
-            
+                self._read_cache[cache_key] = chat
+                return chat
+
             return None
-            
+
         except Exception as e:
-            print(f"Error getting chat by ID: {e}")
+            logger.error("Error getting chat by ID: %s", e)
             return None
     
     async def health_check(self) -> bool:
@@ -258,22 +394,22 @@ class DatabaseManager:
         try:
             if self.client:
                 # Test Supabase connection with a simple query
-                result = self.client.table('recipe_chats').select('count', count='exact').limit(1).execute()
+                result = await self.client.table('recipe_chats').select('count', count='exact').limit(1).execute()
                 return True
             else:
                 # Simple check for in-memory storage
                 return isinstance(self.chats, dict)
             
         except Exception as e:
-            print(f"Database health check failed: {e}")
+            logger.error("Database health check failed: %s", e)
             return False
 
 # Global database manager instance
-db_manager = None
-
+@lru_cache(maxsize=None)
 def get_database_manager() -> DatabaseManager:
-    """Get or create database manager instance"""
-    global db_manager
-    if db_manager is None:
-        db_manager = DatabaseManager()
-    return db_manager
\ No newline at end of file
+    """Get or create the shared database manager instance
+
+    lru_cache makes repeat calls a C-level dict hit, so resolving this
+    dependency on every request costs no more than an attribute lookup.
+    """
+    return DatabaseManager()
\ No newline at end of file
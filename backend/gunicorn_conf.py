@@ -0,0 +1,21 @@
+import os
+
+# Production entrypoint:
+#   gunicorn -c gunicorn_conf.py main:app
+# One async worker per core so CPU-bound work (pydantic validation,
+# JSON encoding) scales past a single process.
+
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('API_PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import the app once before forking so model classes and the prompt
+# template are shared copy-on-write between workers
+preload_app = True
+
+def post_fork(server, worker):
+    # preload_app imports the app (and starts a QueueListener) in the
+    # master; the listener thread does not survive the fork, so each
+    # worker restarts its own
+    from log_config import setup_logging
+    setup_logging()
@@ -0,0 +1,48 @@
+import logging
+import logging.handlers
+import os
+import queue
+
+# The running listener and the pid it was started in; after a fork the
+# inherited listener thread is gone, so setup_logging rebuilds per process
+_listener = None
+_pid = None
+
+def setup_logging() -> None:
+    """Route all records through a queue so log I/O never blocks the event loop
+
+    Handlers do synchronous stream writes; under async load that stalls
+    the loop for the duration of each write. A QueueHandler makes the
+    emit a lock-free put, and a QueueListener thread does the actual I/O.
+
+    Safe to call more than once, and fork-aware: a forked worker (e.g.
+    gunicorn with preload_app) inherits the parent's QueueHandler but
+    not its listener thread, so each process must call this again —
+    see post_fork in gunicorn_conf.py — to get a live listener draining
+    its own queue.
+    """
+    global _listener, _pid
+    if _listener is not None and _pid == os.getpid():
+        return
+
+    root = logging.getLogger()
+
+    # Drop any QueueHandler inherited from a parent process; its queue
+    # has no listener on this side of the fork
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+
+    log_queue: queue.Queue = queue.Queue(-1)
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s')
+    )
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+    _pid = os.getpid()
+
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
@@ -1,60 +1,78 @@
-from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi import FastAPI, HTTPException, Request, Response, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import logging
 import os
+import time
 from dotenv import load_dotenv
 import uvicorn
 from typing import List
+import orjson
 
 # Import our modules
 from models import ChatRequest, ChatResponse, ErrorResponse, HealthCheckResponse, UpdateSessionTitleRequest
-from database import get_database_manager
+from database import DatabaseManager, get_database_manager
 from ai_service import get_ai_service
+from rate_limit import SlidingWindowMiddleware
+from log_config import setup_logging
 
 # Load environment variables
 load_dotenv()
 
-# Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
+# Queue-backed logging so handler I/O stays off the event loop
+setup_logging()
+logger = logging.getLogger('axium')
 
 # Lifespan context manager for startup/shutdown events
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    print("🚀 Starting Smart Recipe Analyzer API...")
+    logger.info("Starting Smart Recipe Analyzer API...")
     
     # Initialize services
     try:
         db_manager = get_database_manager()
         ai_service = get_ai_service()
+
+        # One shared async Supabase client for the app's lifetime
+        await db_manager.connect()
+
+        # Health checks — independent I/O, so run them concurrently
+        db_healthy, ai_healthy = await asyncio.gather(
+            db_manager.health_check(),
+            ai_service.health_check(),
+            return_exceptions=True
+        )
+        db_healthy = db_healthy is True
+        ai_healthy = ai_healthy is True
         
-        # Health checks
-        db_healthy = await db_manager.health_check()
-        ai_healthy = await ai_service.health_check()
-        
-        print(f"📊 Database connection: {'✅ Healthy' if db_healthy else '❌ Failed'}")
-        print(f"🤖 AI service connection: {'✅ Healthy' if ai_healthy else '❌ Failed'}")
+        logger.info("Database connection: %s", 'healthy' if db_healthy else 'failed')
+        logger.info("AI service connection: %s", 'healthy' if ai_healthy else 'failed')
         
         if not db_healthy:
-            print("⚠️  Warning: Database connection failed. Some features may not work.")
+            logger.warning("Database connection failed. Some features may not work.")
         
         if not ai_healthy:
-            print("⚠️  Warning: AI service connection failed. Using fallback recipes.")
+            logger.warning("AI service connection failed. Using fallback recipes.")
         
-        print("✅ Smart Recipe Analyzer API is ready!")
+        logger.info("Smart Recipe Analyzer API is ready")
         
     except Exception as e:
-        print(f"❌ Error during startup: {e}")
+        logger.error("Error during startup: %s", e)
     
     yield
-    
+
     # Shutdown
-    print("🛑 Shutting down Smart Recipe Analyzer API...")
+    logger.info("Shutting down Smart Recipe Analyzer API...")
+    try:
+        await get_database_manager().flush()
+        await get_ai_service().close()
+    except Exception as e:
+        logger.error("Error during shutdown: %s", e)
 
 # Create FastAPI app
 app = FastAPI(
@@ -63,16 +81,26 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
-# Add rate limiting middleware
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-app.add_middleware(SlowAPIMiddleware)
+# Middleware stack is pure ASGI end to end: the sliding-window limiter
+# works on the raw scope and starlette's CORSMiddleware is not built on
+# BaseHTTPMiddleware, so no layer spawns an extra task per request.
+app.add_middleware(SlidingWindowMiddleware)
+
+# Compress large JSON bodies (chatty session histories especially);
+# small responses skip the deflate overhead entirely
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
-# CORS configuration
-cors_origins = os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:5173,http://127.0.0.1:5173').split(',')
+# CORS configuration — normalized once at import; stray whitespace in the
+# env value would otherwise silently fail origin matching
+cors_origins = tuple(
+    origin.strip()
+    for origin in os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:5173,http://127.0.0.1:5173').split(',')
+    if origin.strip()
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -82,225 +110,194 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Rate limiting configuration from environment
-RATE_LIMIT = os.getenv('RATE_LIMIT_REQUESTS', '20')
-RATE_LIMIT_PERIOD = os.getenv('RATE_LIMIT_PERIOD', '60')
-rate_limit_string = f"{RATE_LIMIT}/{RATE_LIMIT_PERIOD}second"
-
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    print(f"Global exception: {exc}")
-    return JSONResponse(
+    logger.exception("Unhandled exception")
+    return ORJSONResponse(
         status_code=500,
         content=ErrorResponse(
             detail="Internal server error occurred",
             error_code="INTERNAL_ERROR"
-        ).dict()
+        ).model_dump(mode='json')
     )
 
+# Async dependency wrapper: a plain sync callable in Depends would be
+# resolved through FastAPI's threadpool on every request — a dispatch
+# hop just to do a cached dict lookup
+async def _db() -> DatabaseManager:
+    return get_database_manager()
+
+# Health check caching — probes and UI polling shouldn't amplify load
+_HEALTH_TTL = float(os.getenv('HEALTH_TTL', '5'))
+_health_cache = {"ts": 0.0, "db": False, "ai": False}
+_health_lock = asyncio.Lock()
+
 # Health check endpoint
 @app.get("/health", response_model=HealthCheckResponse)
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (results cached for HEALTH_TTL seconds)"""
     try:
-        db_manager = get_database_manager()
-        ai_service = get_ai_service()
-        
-        db_healthy = await db_manager.health_check()
-        ai_healthy = await ai_service.health_check()
-        
-        status = "healthy" if db_healthy and ai_healthy else "degraded"
-        
+        if time.monotonic() - _health_cache["ts"] >= _HEALTH_TTL:
+            async with _health_lock:
+                # Re-check under the lock so a probe burst refreshes once
+                if time.monotonic() - _health_cache["ts"] >= _HEALTH_TTL:
+                    db_manager = get_database_manager()
+                    ai_service = get_ai_service()
+
+                    db_healthy, ai_healthy = await asyncio.gather(
+                        db_manager.health_check(),
+                        ai_service.health_check(),
+                        return_exceptions=True
+                    )
+
+                    _health_cache["db"] = db_healthy is True
+                    _health_cache["ai"] = ai_healthy is True
+                    _health_cache["ts"] = time.monotonic()
+
+        status = "healthy" if _health_cache["db"] and _health_cache["ai"] else "degraded"
+
         return HealthCheckResponse(
             status=status,
             version="1.0.0"
         )
-        
+
     except Exception as e:
-        print(f"Health check error: {e}")
+        logger.error("Health check error: %s", e)
         return HealthCheckResponse(
             status="unhealthy",
             version="1.0.0"
         )
 
-# Main chat endpoint
-@app.post("/api/chat/send", response_model=ChatResponse)
-@limiter.limit(rate_limit_string)
-async def send_chat_message(request: Request, chat_request: ChatRequest):
-    """Send a chat message and get recipe recommendations"""
-    try:
-        # Validate input
-        if not chat_request.ingredients.strip():
-            raise HTTPException(
-                status_code=400,
-                detail="Ingredients cannot be empty"
-            )
-        
-        if not chat_request.session_id.strip():
-            raise HTTPException(
-                status_code=400,
-                detail="Session ID cannot be empty"
-            )
-        
-        # Generate recipes using AI
-        ai_service = get_ai_service()
-        recipes = await ai_service.generate_recipes(chat_request.ingredients)
-        
-        if not recipes:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to generate recipes. Please try again."
-            )
-        
-        # Save to database
-        db_manager = get_database_manager()
-        recipes_dict = [recipe.dict() for recipe in recipes]
-        
-        chat_id = await db_manager.save_recipe_chat(
-            session_id=chat_request.session_id,
-            ingredients=chat_request.ingredients,
-            recipes=recipes_dict
-        )
-        
-        if not chat_id:
-            print("Warning: Failed to save chat to database")
-        
-        # Return response
-        return ChatResponse(
-            recipes=recipes,
-            session_id=chat_request.session_id
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Chat endpoint error: {e}")
+# Main chat endpoint — response_model=None skips FastAPI's outbound
+# re-validation; the recipes are already validated Recipe instances, so
+# serializing them again through the response model would double the
+# validation cost. The schema stays documented via `responses`.
+@app.post("/api/chat/send", response_model=None, responses={200: {"model": ChatResponse}})
+async def send_chat_message(chat_request: ChatRequest, db_manager: DatabaseManager = Depends(_db)):
+    """Send a chat message and get recipe recommendations
+
+    Unexpected errors propagate to the global exception handler; only
+    domain outcomes are mapped to HTTPExceptions here.
+    """
+    # Blank-input validation lives on ChatRequest itself
+
+    # Generate recipes using AI
+    ai_service = get_ai_service()
+    recipes = await ai_service.generate_recipes(chat_request.ingredients)
+
+    if not recipes:
         raise HTTPException(
             status_code=500,
-            detail="Failed to process your request. Please try again."
+            detail="Failed to generate recipes. Please try again."
         )
 
+    # Save to database — Recipe models are serialized once in the manager
+    chat_id = await db_manager.save_recipe_chat(
+        session_id=chat_request.session_id,
+        ingredients=chat_request.ingredients,
+        recipes=recipes
+    )
+
+    if not chat_id:
+        logger.warning("Failed to save chat to database")
+
+    # model_construct skips re-validation of the already-validated
+    # recipes; orjson serializes the dump (datetimes included) in C
+    response = ChatResponse.model_construct(
+        recipes=recipes,
+        session_id=chat_request.session_id
+    )
+    return ORJSONResponse(content=response.model_dump())
+
 # Get all sessions endpoint
 @app.get("/api/chat/sessions")
-@limiter.limit(rate_limit_string)
-async def get_all_sessions(request: Request):
-    """Get all chat sessions from database"""
-    try:
-        db_manager = get_database_manager()
-        sessions = await db_manager.get_all_sessions()
-        
-        return {"sessions": sessions}
-        
-    except Exception as e:
-        print(f"Get sessions endpoint error: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail="Failed to retrieve sessions"
-        )
+async def get_all_sessions(request: Request, db_manager: DatabaseManager = Depends(_db)):
+    """Get all chat sessions from database
+
+    Responses carry an ETag over the serialized list; the UI polls this
+    endpoint, so matching If-None-Match requests get an empty 304
+    instead of the full body.
+    """
+    sessions = await db_manager.get_all_sessions()
+
+    body = orjson.dumps({"sessions": sessions})
+    etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers={'ETag': etag})
+
+    return Response(content=body, media_type='application/json', headers={'ETag': etag})
 
 # Get session history endpoint
 @app.get("/api/chat/history/{session_id}")
-@limiter.limit(rate_limit_string)
-async def get_session_history(request: Request, session_id: str):
+async def get_session_history(session_id: str, db_manager: DatabaseManager = Depends(_db)):
     """Get chat history for a specific session"""
-    try:
-        if not session_id.strip():
-            raise HTTPException(
-                status_code=400,
-                detail="Session ID cannot be empty"
-            )
-        
-        db_manager = get_database_manager()
-        chats = await db_manager.get_session_chats(session_id)
-        
-        # Convert to response format
-        history = []
-        for chat in chats:
-            history.append({
+    if not session_id.strip():
+        raise HTTPException(
+            status_code=400,
+            detail="Session ID cannot be empty"
+        )
+
+    chats = await db_manager.get_session_chats(session_id)
+
+    # Return an ORJSONResponse directly: a plain dict would go through
+    # jsonable_encoder, which isoformats every datetime in Python before
+    # the response class sees it. orjson handles created_at natively.
+    return ORJSONResponse({
+        "history": [
+            {
                 "id": chat.id,
                 "ingredients": chat.ingredients,
                 "recipes": chat.recipes_json.get('recipes', []),
-                "timestamp": chat.created_at.isoformat()
-            })
-        
-        return {"history": history}
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"History endpoint error: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail="Failed to retrieve chat history"
-        )
+                "timestamp": chat.created_at
+            }
+            for chat in chats
+        ]
+    })
 
 # Delete session endpoint
 @app.delete("/api/chat/session/{session_id}")
-@limiter.limit(rate_limit_string)
-async def delete_session(request: Request, session_id: str):
+async def delete_session(session_id: str, db_manager: DatabaseManager = Depends(_db)):
     """Delete all chats for a specific session"""
-    try:
-        if not session_id.strip():
-            raise HTTPException(
-                status_code=400,
-                detail="Session ID cannot be empty"
-            )
-        
-        db_manager = get_database_manager()
-        success = await db_manager.delete_session_chats(session_id)
-        
-        if success:
-            return {"message": "Session deleted successfully"}
-        else:
-            raise HTTPException(
-                status_code=404,
-                detail="Session not found or already deleted"
-            )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Delete session endpoint error: {e}")
+    if not session_id.strip():
         raise HTTPException(
-            status_code=500,
-            detail="Failed to delete session"
+            status_code=400,
+            detail="Session ID cannot be empty"
         )
 
+    success = await db_manager.delete_session_chats(session_id)
+
+    if success:
+        return {"message": "Session deleted successfully"}
+
+    raise HTTPException(
+        status_code=404,
+        detail="Session not found or already deleted"
+    )
+
 # Update session title endpoint
 @app.put("/api/chat/session/{session_id}/title")
-@limiter.limit(rate_limit_string)
-async def update_session_title(request: Request, session_id: str, title_request: UpdateSessionTitleRequest):
+async def update_session_title(session_id: str, title_request: UpdateSessionTitleRequest, db_manager: DatabaseManager = Depends(_db)):
     """Update the title for a chat session"""
-    try:
-        # Validate input
-        if not session_id.strip():
-            raise HTTPException(
-                status_code=400,
-                detail="Session ID cannot be empty"
-            )
-        
-        # Update session title in database
-        db_manager = get_database_manager()
-        success = await db_manager.update_session_title(session_id, title_request.title)
-        
-        if success:
-            return {"message": "Session title updated successfully", "title": title_request.title}
-        else:
-            raise HTTPException(
-                status_code=404,
-                detail="Session not found"
-            )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Update session title endpoint error: {e}")
+    # Validate input
+    if not session_id.strip():
         raise HTTPException(
-            status_code=500,
-            detail="Failed to update session title"
+            status_code=400,
+            detail="Session ID cannot be empty"
         )
 
+    # Update session title in database
+    success = await db_manager.update_session_title(session_id, title_request.title)
+
+    if success:
+        return {"message": "Session title updated successfully", "title": title_request.title}
+
+    raise HTTPException(
+        status_code=404,
+        detail="Session not found"
+    )
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -322,11 +319,17 @@ if __name__ == "__main__":
     print(f"🚀 Starting server on {host}:{port}")
     print(f"📚 API Documentation: http://{host}:{port}/docs")
     print(f"🔄 Auto-reload: {reload}")
+    print("💡 Production: gunicorn -c gunicorn_conf.py main:app")
     
     uvicorn.run(
         "main:app",
         host=host,
         port=port,
         reload=reload,
-        log_level="info"
+        # uvloop's C event loop and httptools parser; the reloader needs
+        # the default asyncio loop, so dev keeps it along with access logs
+        loop="asyncio" if reload else "uvloop",
+        http="httptools",
+        log_level="info" if reload else "warning",
+        access_log=reload
     )
\ No newline at end of file
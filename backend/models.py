@@ -1,12 +1,25 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import datetime, timezone
+
+def _utcnow() -> datetime:
+    """Timezone-aware UTC timestamp; avoids the local-tz lookup of naive now()"""
+    return datetime.now(timezone.utc)
 
 class ChatRequest(BaseModel):
     """Request model for chat endpoint"""
     ingredients: str = Field(..., min_length=1, description="Comma-separated list of ingredients")
     session_id: str = Field(..., min_length=1, description="Unique session identifier")
 
+    @field_validator('ingredients', 'session_id')
+    @classmethod
+    def _strip_nonblank(cls, value: str) -> str:
+        # min_length=1 alone still admits whitespace-only strings
+        value = value.strip()
+        if not value:
+            raise ValueError('must not be blank')
+        return value
+
 class NutritionInfo(BaseModel):
     """Nutrition information model"""
     calories: int = Field(..., ge=0, description="Calories per serving")
@@ -22,17 +35,44 @@ class Recipe(BaseModel):
     difficulty: str = Field(..., description="Difficulty level (Easy, Medium, Hard)")
     nutrition: NutritionInfo = Field(..., description="Nutritional information")
 
+class RecipeIn(BaseModel):
+    """Lenient recipe model for validating raw AI output in one pass
+
+    Every field is defaulted and malformed values are coerced, so one
+    model_validate call replaces the old hand-rolled setdefault chain.
+    """
+    name: str = 'Unnamed Recipe'
+    ingredients: List[str] = Field(default_factory=lambda: ['No ingredients specified'])
+    instructions: List[str] = Field(default_factory=lambda: ['No instructions provided'])
+    cookingTime: str = '30 minutes'
+    difficulty: str = 'Medium'
+    nutrition: NutritionInfo = Field(default_factory=lambda: NutritionInfo(calories=300, protein='12g', carbs='35g'))
+
+    @field_validator('ingredients', 'instructions', mode='before')
+    @classmethod
+    def _coerce_list(cls, value):
+        if not isinstance(value, list):
+            return [str(value)]
+        return value
+
+    @field_validator('nutrition', mode='before')
+    @classmethod
+    def _coerce_nutrition(cls, value):
+        if not isinstance(value, (dict, NutritionInfo)):
+            return {'calories': 300, 'protein': '12g', 'carbs': '35g'}
+        return value
+
 class ChatResponse(BaseModel):
     """Response model for chat endpoint"""
     recipes: List[Recipe] = Field(..., description="List of generated recipes")
     session_id: str = Field(..., description="Session identifier")
-    timestamp: datetime = Field(default_factory=datetime.now, description="Response timestamp")
+    timestamp: datetime = Field(default_factory=_utcnow, description="Response timestamp")
 
 class ErrorResponse(BaseModel):
     """Error response model"""
     detail: str = Field(..., description="Error message")
     error_code: Optional[str] = Field(None, description="Error code")
-    timestamp: datetime = Field(default_factory=datetime.now, description="Error timestamp")
+    timestamp: datetime = Field(default_factory=_utcnow, description="Error timestamp")
 
 class RecipeChatRecord(BaseModel):
     """Database record model for recipe chats"""
@@ -51,5 +91,5 @@ class UpdateSessionTitleRequest(BaseModel):
 class HealthCheckResponse(BaseModel):
     """Health check response model"""
     status: str = Field(default="healthy", description="Service status")
-    timestamp: datetime = Field(default_factory=datetime.now, description="Check timestamp")
+    timestamp: datetime = Field(default_factory=_utcnow, description="Check timestamp")
     version: str = Field(default="1.0.0", description="API version")
\ No newline at end of file
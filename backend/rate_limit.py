@@ -0,0 +1,158 @@
+import logging
+import os
+import time
+from typing import Dict, Tuple
+import orjson
+import redis.asyncio as aioredis
+
+logger = logging.getLogger('axium.rate_limit')
+
+# Rate limiting configuration from environment, read once at import —
+# per-request checks compare against these plain numbers; nothing is
+# parsed or fetched from the environment on the hot path
+RATE_LIMIT = int(os.getenv('RATE_LIMIT_REQUESTS', '20'))
+RATE_LIMIT_PERIOD = float(os.getenv('RATE_LIMIT_PERIOD', '60'))
+
+# The 429 response never varies, so serialize it once
+_LIMIT_BODY = orjson.dumps({'detail': 'Rate limit exceeded', 'error_code': 'RATE_LIMITED'})
+_LIMIT_HEADERS = [
+    (b'content-type', b'application/json'),
+    (b'content-length', str(len(_LIMIT_BODY)).encode())
+]
+
+# Same sliding-window algorithm as the in-process path, run atomically in
+# Redis so every worker shares one set of counters. One EVALSHA per
+# request; Redis TIME keeps all workers on the same clock.
+_SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', key, 'prev', 'curr', 'start')
+local prev = tonumber(state[1]) or 0
+local curr = tonumber(state[2]) or 0
+local start = tonumber(state[3]) or now
+local elapsed = (now - start) / window
+if elapsed >= 1 then
+    local whole = math.floor(elapsed)
+    if whole == 1 then prev = curr else prev = 0 end
+    curr = 0
+    start = start + window * whole
+    elapsed = (now - start) / window
+end
+local weighted = prev * (1 - elapsed) + curr + 1
+local allowed = 0
+if weighted <= limit then
+    curr = curr + 1
+    allowed = 1
+end
+redis.call('HMSET', key, 'prev', prev, 'curr', curr, 'start', start)
+redis.call('EXPIRE', key, math.ceil(window * 2))
+return allowed
+"""
+
+class SlidingWindowMiddleware:
+    """Pure-ASGI per-IP sliding-window rate limiter
+
+    Works directly on the ASGI scope — no Request construction, no
+    BaseHTTPMiddleware task-per-request overhead. The previous window's
+    count is weighted by the fraction of it still covered, so bursts at
+    window boundaries can't slip through at twice the limit the way a
+    fixed window allows. Per request it's one dict lookup plus a little
+    arithmetic — no timestamp lists. Only /api/ paths are limited.
+
+    When RATE_LIMIT_REDIS_URL is set, the window state lives in Redis
+    and is updated by an atomic Lua script, so multiple workers enforce
+    one shared limit instead of N independent ones.
+    """
+
+    def __init__(self, app, limit: int = RATE_LIMIT, period: float = RATE_LIMIT_PERIOD):
+        self.app = app
+        self.limit = limit
+        self.window = period
+        # client ip -> (prev_count, curr_count, window_start_monotonic)
+        self._windows: Dict[str, Tuple[int, int, float]] = {}
+        # Requests since the last sweep of idle client entries
+        self._since_sweep = 0
+
+        redis_url = os.getenv('RATE_LIMIT_REDIS_URL')
+        self._redis = aioredis.from_url(redis_url) if redis_url else None
+        self._script = None
+
+    async def _allow_redis(self, key: str) -> bool:
+        """Run the sliding-window script against shared Redis state"""
+        if self._script is None:
+            # register_script handles SCRIPT LOAD + EVALSHA transparently
+            self._script = self._redis.register_script(_SLIDING_WINDOW_LUA)
+
+        allowed = await self._script(
+            keys=[f'ratelimit:{key}'],
+            args=[self.limit, self.window]
+        )
+        return bool(allowed)
+
+    def _prune(self, now: float) -> None:
+        """Drop entries idle for over two windows (mirrors the Redis EXPIRE)"""
+        cutoff = now - self.window * 2
+        stale = [k for k, (_, _, start) in self._windows.items() if start < cutoff]
+        for k in stale:
+            del self._windows[k]
+
+    def _allow(self, key: str) -> bool:
+        """Check the weighted request count for this key and record one"""
+        now = time.monotonic()
+
+        # Periodic sweep so one-off client IPs don't accumulate forever
+        self._since_sweep += 1
+        if self._since_sweep >= 1024:
+            self._since_sweep = 0
+            self._prune(now)
+
+        prev, curr, start = self._windows.get(key, (0, 0, now))
+
+        elapsed = (now - start) / self.window
+        if elapsed >= 1.0:
+            # Rotate windows; after a long gap the previous one is empty
+            whole = int(elapsed)
+            prev = curr if whole == 1 else 0
+            curr = 0
+            start += self.window * whole
+            elapsed = (now - start) / self.window
+
+        weighted = prev * (1.0 - elapsed) + curr + 1
+        if weighted <= self.limit:
+            self._windows[key] = (prev, curr + 1, start)
+            return True
+
+        self._windows[key] = (prev, curr, start)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith('/api/'):
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get('client')
+        key = client[0] if client else 'unknown'
+
+        if self._redis is not None:
+            try:
+                allowed = await self._allow_redis(key)
+            except Exception as e:
+                # Fail open to the in-process window if Redis is down
+                logger.warning("Rate limiter Redis error, using local state: %s", e)
+                allowed = self._allow(key)
+        else:
+            allowed = self._allow(key)
+
+        if allowed:
+            await self.app(scope, receive, send)
+            return
+
+        await send({
+            'type': 'http.response.start',
+            'status': 429,
+            'headers': _LIMIT_HEADERS
+        })
+        await send({'type': 'http.response.body', 'body': _LIMIT_BODY})
@@ -0,0 +1,20 @@
+-- Migration script to add the latest_session_chats view
+-- Moves the "latest chat per session" aggregation into Postgres so
+-- get_all_sessions no longer downloads and groups every row client-side
+
+CREATE OR REPLACE VIEW latest_session_chats AS
+SELECT DISTINCT ON (session_id)
+    session_id,
+    title,
+    created_at
+FROM recipe_chats
+ORDER BY session_id, created_at DESC;
+
+-- Grant read access to anon and authenticated users
+GRANT SELECT ON latest_session_chats TO anon;
+GRANT SELECT ON latest_session_chats TO authenticated;
+
+-- Verify the view was created
+SELECT table_name
+FROM information_schema.views
+WHERE table_name = 'latest_session_chats';